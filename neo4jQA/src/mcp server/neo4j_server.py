@@ -1,6 +1,8 @@
 import os
+import threading
 from typing import Any, Dict
 
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from langchain_openai import ChatOpenAI
@@ -9,6 +11,22 @@ from langchain_neo4j import Neo4jGraph, GraphCypherQAChain
 
 mcp = FastMCP("Neo4jMovieServer")
 
+# Upper bound on pooled Bolt connections held by the shared driver
+NEO4J_POOL_SIZE = 16
+
+# Caches for repeated questions: normalized question -> final answer (skips
+# both LLM calls), normalized question -> generated Cypher (skips the
+# NL->Cypher LLM call), and Cypher -> graph.query rows. Answers expire before
+# the Cypher, and every answer hit re-sets the Cypher entry, so an expired
+# answer still reuses the cached Cypher and only reruns the QA step.
+CACHE_MAXSIZE = 512
+CACHE_TTL_SECONDS = 3600
+RESULT_TTL_SECONDS = 300
+CONTEXT_TTL_SECONDS = 60
+_NL2CYPHER: TTLCache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL_SECONDS)
+_RESULT: TTLCache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=RESULT_TTL_SECONDS)
+_CONTEXT: TTLCache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CONTEXT_TTL_SECONDS)
+
 
 def _build_chain() -> GraphCypherQAChain:
     """Initialize Neo4j GraphCypherQAChain from environment variables."""
@@ -31,8 +49,9 @@ def _build_chain() -> GraphCypherQAChain:
     if not api_key:
         raise ValueError("未找到 LLM_API_KEY，请在 .env 中配置")
 
-    graph = Neo4jGraph()
-    graph.refresh_schema()
+    # Neo4jGraph keeps one long-lived driver (connection pool) for all queries;
+    # constructing it verifies connectivity and refreshes the schema once.
+    graph = Neo4jGraph(driver_config={"max_connection_pool_size": NEO4J_POOL_SIZE})
 
     llm = ChatOpenAI(
         model=model,
@@ -42,22 +61,57 @@ def _build_chain() -> GraphCypherQAChain:
     )
 
     chain = GraphCypherQAChain.from_llm(
-        graph=graph, llm=llm, verbose=True, allow_dangerous_requests=True
+        graph=graph,
+        llm=llm,
+        verbose=True,
+        allow_dangerous_requests=True,
+        return_intermediate_steps=True,
     )
     return chain
 
 
 # Lazy singleton for the chain so the server starts fast
 _CHAIN: GraphCypherQAChain | None = None
+_CHAIN_LOCK = threading.Lock()
 
 
 def _get_chain() -> GraphCypherQAChain:
     global _CHAIN
     if _CHAIN is None:
-        _CHAIN = _build_chain()
+        with _CHAIN_LOCK:
+            if _CHAIN is None:
+                _CHAIN = _build_chain()
     return _CHAIN
 
 
+def _warm_chain() -> None:
+    """Build the chain in the background; errors resurface on the first query."""
+    try:
+        _get_chain()
+    except Exception:
+        pass
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
+
+def _extract_step(result: Dict[str, Any], name: str) -> Any:
+    """Pull ``query`` (Cypher) or ``context`` (rows) out of the intermediate steps."""
+    for step in result.get("intermediate_steps") or []:
+        if isinstance(step, dict) and name in step:
+            return step[name]
+    return None
+
+
+def _run_qa(chain: GraphCypherQAChain, question: str, context: Any) -> str:
+    """Run only the QA step; langchain-neo4j < 0.3 wraps the answer in an LLMChain dict."""
+    answer = chain.qa_chain.invoke({"question": question, "context": context})
+    if isinstance(answer, dict):
+        answer = answer[chain.qa_chain.output_key]
+    return str(answer)
+
+
 @mcp.tool()
 def neo4j_query(question: str) -> str:
     """
@@ -71,16 +125,43 @@ def neo4j_query(question: str) -> str:
         查询结果的字符串表示。
     """
     try:
+        key = _normalize_question(question)
+        cypher = _NL2CYPHER.get(key)
+        if key in _RESULT:
+            # Keep the Cypher alive for as long as the question keeps being asked
+            if cypher is not None:
+                _NL2CYPHER[key] = cypher
+            return _RESULT[key]
+
         chain = _get_chain()
-        result: Dict[str, Any] = chain.invoke({"query": question})
-        if isinstance(result, dict):
-            return str(result.get("result") or result.get("text") or result)
-        return str(result)
+        if cypher is None:
+            result: Dict[str, Any] = chain.invoke({"query": question})
+            if not isinstance(result, dict):
+                return str(result)
+            answer = str(result.get("result") or result.get("text") or result)
+            cypher = _extract_step(result, "query")
+            if cypher:
+                _NL2CYPHER[key] = cypher
+                context = _extract_step(result, "context")
+                if context is not None:
+                    _CONTEXT[cypher] = context
+        else:
+            # Known question whose answer expired: reuse the cached Cypher and only run the QA step
+            context = _CONTEXT.get(cypher)
+            if context is None:
+                context = chain.graph.query(cypher)[: chain.top_k]
+                _CONTEXT[cypher] = context
+            answer = _run_qa(chain, question, context)
+
+        _RESULT[key] = answer
+        return answer
     except Exception as exc:
         return f"Neo4j 查询失败: {exc}"
 
 
 if __name__ == "__main__":
+    # Build the chain while the stdio transport starts up
+    threading.Thread(target=_warm_chain, daemon=True).start()
     # Run as stdio MCP server
     mcp.run(transport="stdio")
 
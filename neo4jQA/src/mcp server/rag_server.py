@@ -4,7 +4,10 @@ import logging
 from pathlib import Path
 from typing import List, Optional
 from mcp.server.fastmcp import FastMCP
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_community.embeddings import DashScopeEmbeddings
 from langchain.tools.retriever import create_retriever_tool
 import json
@@ -31,6 +34,13 @@ mcp = FastMCP("RAGServer")
 embeddings = None
 FAISS_DB_PATH = "faiss_db"
 
+# IVF 索引每次查询扫描的倒排列表数量
+IVF_NPROBE = 8
+
+# 已加载的向量库及其索引文件的修改时间，索引文件变化时才重新加载
+_VSTORE = None
+_VSTORE_MTIME = None
+
 
 def initialize_embeddings():
     """初始化嵌入模型"""
@@ -55,6 +65,46 @@ def check_database_exists() -> bool:
     return os.path.exists(FAISS_DB_PATH) and os.path.exists(os.path.join(FAISS_DB_PATH, "index.faiss"))
 
 
+def _get_vector_store():
+    """获取FAISS向量库，仅在首次调用或索引文件更新后从磁盘加载"""
+    global _VSTORE, _VSTORE_MTIME
+    index_path = os.path.join(FAISS_DB_PATH, "index.faiss")
+    mtime = os.stat(index_path).st_mtime
+    if _VSTORE is None or _VSTORE_MTIME != mtime:
+        logger.info("开始加载FAISS数据库")
+        _VSTORE = FAISS.load_local(
+            FAISS_DB_PATH,
+            initialize_embeddings(),
+            allow_dangerous_deserialization=True
+        )
+        # save_local 不保存距离策略，按加载后索引的度量类型恢复内积策略
+        if _VSTORE.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            _VSTORE.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+        ivf = faiss.try_extract_index_ivf(_VSTORE.index)
+        if ivf is not None:
+            # IVF 索引改用 mmap 只读方式打开，由操作系统按需分页加载倒排列表；
+            # 部分平台（如 Windows 版 faiss-cpu）不支持 OnDiskInvertedLists，
+            # 打开失败时继续使用内存中的索引
+            try:
+                mmap_index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                ivf = faiss.try_extract_index_ivf(mmap_index)
+                _VSTORE.index = mmap_index
+            except Exception as e:
+                logger.warning(f"以mmap方式打开IVF索引失败，使用内存索引: {str(e)}")
+            ivf.nprobe = IVF_NPROBE
+        _VSTORE_MTIME = mtime
+        logger.info("FAISS数据库加载成功")
+    return _VSTORE
+
+
+def _query_vector(vector_store, text: str) -> list:
+    """生成检索用的查询向量，内积索引的文档向量已归一化，查询向量同样归一化"""
+    vector = np.asarray([initialize_embeddings().embed_query(text)], dtype=np.float32)
+    if vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        faiss.normalize_L2(vector)
+    return vector[0].tolist()
+
+
 
 @mcp.tool()
 def query_documents(question: str, top_k: int = 5) -> str:
@@ -79,22 +129,12 @@ def query_documents(question: str, top_k: int = 5) -> str:
         
         logger.info("FAISS数据库存在，继续查询")
         
-        # 初始化嵌入模型
-        logger.debug("初始化嵌入模型")
-        embeddings = initialize_embeddings()
-        
-        # 加载FAISS数据库
-        logger.info("开始加载FAISS数据库")
-        vector_store = FAISS.load_local(
-            FAISS_DB_PATH, 
-            embeddings, 
-            allow_dangerous_deserialization=True
-        )
-        logger.info("FAISS数据库加载成功")
+        # 加载FAISS数据库（已缓存时直接复用）
+        vector_store = _get_vector_store()
         
         # 执行相似性搜索
         logger.info(f"执行相似性搜索，查询: '{question}', 返回数量: {top_k}")
-        docs = vector_store.similarity_search(question, k=top_k)
+        docs = vector_store.similarity_search_by_vector(_query_vector(vector_store, question), k=top_k)
         logger.info(f"搜索完成，找到 {len(docs)} 个相关文档")
         
         if not docs:
@@ -181,18 +221,11 @@ def search_similar_documents(query: str, top_k: int = 3) -> str:
         if not check_database_exists():
             return " 请先上传并处理PDF文件！"
 
-        # 初始化嵌入模型
-        embeddings = initialize_embeddings()
-
-        # 加载FAISS数据库
-        vector_store = FAISS.load_local(
-            FAISS_DB_PATH,
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
+        # 加载FAISS数据库（已缓存时直接复用）
+        vector_store = _get_vector_store()
 
         # 执行相似性搜索
-        docs = vector_store.similarity_search(query, k=top_k)
+        docs = vector_store.similarity_search_by_vector(_query_vector(vector_store, query), k=top_k)
 
         if not docs:
             return " 没有找到相关的文档内容"
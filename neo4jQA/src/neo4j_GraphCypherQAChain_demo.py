@@ -5,6 +5,8 @@ Neo4j 图数据库连接和操作
 
 import os
 import csv
+from itertools import islice
+from typing import Any, Dict, Iterator, List
 from dotenv import load_dotenv
 from langchain_neo4j import Neo4jGraph, GraphCypherQAChain
 from langchain_openai import ChatOpenAI
@@ -20,20 +22,16 @@ os.environ["NEO4J_URI"] = "bolt://localhost:7687"
 os.environ["NEO4J_USERNAME"] = "neo4j"
 os.environ["NEO4J_PASSWORD"] = "neo4jroot"
 
-def main() -> None:
-    graph = Neo4jGraph()
-    # 读取与本文件同目录下的本地 CSV 文件
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(current_dir, "movies_small.csv")
+# 每批写入 Neo4j 的 CSV 行数
+BATCH_SIZE = 1000
 
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"未找到本地文件: {csv_path}")
 
-    rows = []
+def iter_movie_rows(csv_path: str) -> Iterator[Dict[str, str]]:
+    """逐行读取电影 CSV，避免一次性将整个文件加载到内存"""
     with open(csv_path, mode="r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            rows.append({
+            yield {
                 "movieId": row.get("movieId", ""),
                 "title": row.get("title", ""),
                 "released": row.get("released", ""),
@@ -41,26 +39,91 @@ def main() -> None:
                 "director": row.get("director", ""),
                 "actors": row.get("actors", ""),
                 "genres": row.get("genres", ""),
-            })
-
-    movies_query = """
-UNWIND $rows AS row
-MERGE (m:Movie {id: row.movieId})
-SET m.released = CASE WHEN row.released = "" THEN NULL ELSE date(row.released) END,
-    m.title = row.title,
-    m.imdbRating = CASE WHEN row.imdbRating = "" THEN NULL ELSE toFloat(row.imdbRating) END
-WITH m, row
-FOREACH (director IN (CASE WHEN row.director = "" THEN [] ELSE split(row.director, '|') END) |
-    MERGE (p:Person {name: trim(director)})
-    MERGE (p)-[:DIRECTED]->(m))
-FOREACH (actor IN (CASE WHEN row.actors = "" THEN [] ELSE split(row.actors, '|') END) |
-    MERGE (p2:Person {name: trim(actor)})
-    MERGE (p2)-[:ACTED_IN]->(m))
-FOREACH (genre IN (CASE WHEN row.genres = "" THEN [] ELSE split(row.genres, '|') END) |
-    MERGE (g:Genre {name: trim(genre)})
-    MERGE (m)-[:IN_GENRE]->(g))
+            }
+
+
+# 唯一性查找用到的索引，保证 MERGE / MATCH 走索引而非全表扫描
+INDEX_QUERIES = [
+    "CREATE INDEX movie_id IF NOT EXISTS FOR (m:Movie) ON (m.id)",
+    "CREATE INDEX person_name IF NOT EXISTS FOR (p:Person) ON (p.name)",
+    "CREATE INDEX genre_name IF NOT EXISTS FOR (g:Genre) ON (g.name)",
+]
+
+MOVIES_QUERY = """
+UNWIND $rows AS r
+MERGE (m:Movie {id: r.id})
+SET m.title = r.title,
+    m.released = date(r.released),
+    m.imdbRating = toFloat(r.imdbRating)
+"""
+
+DIRECTED_QUERY = """
+UNWIND $rows AS r
+MATCH (m:Movie {id: r.movieId})
+MERGE (p:Person {name: r.name})
+MERGE (p)-[:DIRECTED]->(m)
+"""
+
+ACTED_IN_QUERY = """
+UNWIND $rows AS r
+MATCH (m:Movie {id: r.movieId})
+MERGE (p:Person {name: r.name})
+MERGE (p)-[:ACTED_IN]->(m)
+"""
+
+IN_GENRE_QUERY = """
+UNWIND $rows AS r
+MATCH (m:Movie {id: r.movieId})
+MERGE (g:Genre {name: r.name})
+MERGE (m)-[:IN_GENRE]->(g)
 """
-    graph.query(movies_query, params={"rows": rows})
+
+
+def split_names(value: str) -> List[str]:
+    """拆分以 '|' 分隔的名称列表，去除空白与空项"""
+    return [name.strip() for name in value.split("|") if name.strip()]
+
+
+def ingest_batch(graph: Neo4jGraph, batch: List[Dict[str, str]]) -> None:
+    """在 Python 侧拆分一批 CSV 行，再分别以 UNWIND + MERGE 写入节点与关系"""
+    movies: List[Dict[str, Any]] = []
+    directed: List[Dict[str, str]] = []
+    acted: List[Dict[str, str]] = []
+    genres: List[Dict[str, str]] = []
+    for row in batch:
+        movie_id = row["movieId"]
+        movies.append({
+            "id": movie_id,
+            "title": row["title"],
+            "released": row["released"] or None,
+            "imdbRating": row["imdbRating"] or None,
+        })
+        directed.extend({"movieId": movie_id, "name": name} for name in split_names(row["director"]))
+        acted.extend({"movieId": movie_id, "name": name} for name in split_names(row["actors"]))
+        genres.extend({"movieId": movie_id, "name": name} for name in split_names(row["genres"]))
+
+    graph.query(MOVIES_QUERY, params={"rows": movies})
+    graph.query(DIRECTED_QUERY, params={"rows": directed})
+    graph.query(ACTED_IN_QUERY, params={"rows": acted})
+    graph.query(IN_GENRE_QUERY, params={"rows": genres})
+
+
+def main() -> None:
+    graph = Neo4jGraph()
+    # 读取与本文件同目录下的本地 CSV 文件
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = os.path.join(current_dir, "movies_small.csv")
+
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"未找到本地文件: {csv_path}")
+
+    for index_query in INDEX_QUERIES:
+        graph.query(index_query)
+
+    # 分批提交，限制 Python 与 Neo4j 两侧的内存占用
+    rows = iter_movie_rows(csv_path)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        ingest_batch(graph, batch)
     
     # 刷新并打印图数据库的 schema，便于后续 LLM 生成 Cypher 使用
     graph.refresh_schema()
@@ -6,15 +6,20 @@ PDF处理脚本 - 上传并处理PDF文件，创建向量数据库
 
 import os
 import sys
+import math
+import shutil
 import argparse
+import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import DashScopeEmbeddings
+from typing import TYPE_CHECKING, List
 from dotenv import load_dotenv
 
+# PDF 解析、FAISS 与 langchain 相关模块较重，在实际用到的函数内再导入
+if TYPE_CHECKING:
+    import numpy as np
+
 # 加载环境变量
 load_dotenv(Path(__file__).parent / '.env')
 
@@ -31,9 +36,22 @@ logger = logging.getLogger(__name__)
 # 全局变量
 FAISS_DB_PATH = "faiss_db"
 
+# OPQ+IVF+PQ 索引参数：先用 OPQ 学习旋转并降到 OPQ_DIM 维，再做 PQ 编码。
+# PQ 每个子空间训练 256 个中心，向量过少时训练不充分，此时退回 FP16 存储的精确检索索引
+PQ_M = 16
+PQ_NBITS = 8
+OPQ_DIM = 64
+IVFPQ_MIN_VECTORS = 39 * (1 << PQ_NBITS)
+
+# DashScope text-embedding-v1 单次请求最多 25 条文本，多个批次并发请求
+EMBED_BATCH_SIZE = 25
+EMBED_MAX_WORKERS = 8
+
 
 def initialize_embeddings():
     """初始化嵌入模型"""
+    from langchain_community.embeddings import DashScopeEmbeddings
+
     logger.info("正在初始化嵌入模型...")
     dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
     if not dashscope_api_key:
@@ -48,6 +66,113 @@ def initialize_embeddings():
     return embeddings
 
 
+def extract_pages_pdfium(pdf_path: str) -> List[str]:
+    """使用 pypdfium2 (PDFium) 逐页提取PDF文本"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        logger.info(f"PDF总页数: {len(pdf)}")
+        parts: List[str] = []
+        for page_num in range(len(pdf)):
+            # PDFium 以 \r\n 换行，统一为 \n 以与 PyPDF2 的输出及文本分割符保持一致
+            page_text = pdf[page_num].get_textpage().get_text_range()
+            page_text = page_text.replace("\r\n", "\n").replace("\r", "\n")
+            parts.append(page_text)
+            logger.debug(f"已处理第 {page_num + 1} 页，提取字符数: {len(page_text)}")
+        return parts
+    finally:
+        pdf.close()
+
+
+def extract_pages_pypdf2(pdf_path: str) -> List[str]:
+    """使用 PyPDF2 逐页提取PDF文本，作为 pypdfium2 无法解析时的兜底"""
+    import PyPDF2
+
+    parts: List[str] = []
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        total_pages = len(pdf_reader.pages)
+        logger.info(f"PDF总页数: {total_pages}")
+        
+        for page_num, page in enumerate(pdf_reader.pages, 1):
+            page_text = page.extract_text()
+            parts.append(page_text)
+            logger.debug(f"已处理第 {page_num} 页，提取字符数: {len(page_text)}")
+    return parts
+
+
+def embed_texts(embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    按批次并发生成文本嵌入向量
+
+    Args:
+        embeddings: 嵌入模型
+        texts: 待嵌入的文本列表
+
+    Returns:
+        List[List[float]]: 与 texts 顺序一致的嵌入向量
+    """
+    batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    logger.info(f"共 {len(batches)} 个嵌入批次，并发数: {EMBED_MAX_WORKERS}")
+    with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as executor:
+        results = executor.map(embeddings.embed_documents, batches)
+    return [vector for batch in results for vector in batch]
+
+
+def build_faiss_index(vectors: "np.ndarray"):
+    """
+    根据向量规模构建FAISS索引，向量原地做 L2 归一化后使用内积度量（即余弦相似度）
+
+    Args:
+        vectors: 形状为 (N, d) 的 float32 向量矩阵
+
+    Returns:
+        faiss.Index: 大规模语料使用 OPQ+IVF+PQ 压缩索引，否则使用 FP16 精确索引
+    """
+    import faiss
+
+    n, d = vectors.shape
+    faiss.normalize_L2(vectors)
+    if n < IVFPQ_MIN_VECTORS:
+        # FP16 存储使每个向量的内存/带宽减半，召回几乎无损
+        logger.info(f"向量数 {n}，使用 FP16 标量量化的精确索引")
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+        return index
+
+    # IVF 的 k-means 每个中心同样至少需要 39 个训练点，语料规模不足时减少倒排列表数
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+    factory = f"OPQ{PQ_M}_{OPQ_DIM},IVF{nlist},PQ{PQ_M}x{PQ_NBITS}"
+    logger.info(f"使用 OPQ+IVF+PQ 索引: {factory}")
+    index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def save_vector_store(vector_store, db_path: str) -> None:
+    """
+    原子地保存向量数据库：先写入同目录下的临时目录，再用 os.replace 替换原文件。
+    查询端以 mmap 方式打开 index.faiss，原地截断重写会使其读取时触发 SIGBUS
+
+    Args:
+        vector_store: 待保存的 FAISS 向量库
+        db_path: 向量数据库目录
+    """
+    db_path = os.path.abspath(db_path)
+    os.makedirs(db_path, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".faiss_tmp_", dir=os.path.dirname(db_path))
+    try:
+        vector_store.save_local(tmp_dir)
+        # 查询端按 index.faiss 的修改时间判断是否重新加载，故最后替换 index.faiss
+        for name in ("index.pkl", "index.faiss"):
+            os.replace(os.path.join(tmp_dir, name), os.path.join(db_path, name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
 def upload_and_process_pdf(pdf_path: str) -> str:
     """
     上传并处理PDF文件，创建向量数据库
@@ -59,6 +184,13 @@ def upload_and_process_pdf(pdf_path: str) -> str:
         str: 处理结果信息
     """
     try:
+        import numpy as np
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.vectorstores.utils import DistanceStrategy
+        from langchain_core.documents import Document
+
         logger.info(f"开始处理PDF文件: {pdf_path}")
         
         # 步骤1: 检查文件是否存在
@@ -76,20 +208,21 @@ def upload_and_process_pdf(pdf_path: str) -> str:
         
         # 步骤3: 读取PDF内容
         logger.info("步骤3: 读取PDF内容")
-        raw_text = ""
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            logger.info(f"PDF总页数: {total_pages}")
-            
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                page_text = page.extract_text()
-                raw_text += page_text
-                logger.debug(f"已处理第 {page_num} 页，提取字符数: {len(page_text)}")
+        try:
+            pages = extract_pages_pdfium(pdf_path)
+        except Exception as e:
+            logger.warning(f"pypdfium2 解析失败，改用 PyPDF2: {str(e)}")
+            pages = extract_pages_pypdf2(pdf_path)
         
-        logger.info(f"PDF文本提取完成，总字符数: {len(raw_text)}")
+        # 按页组织为 Document，分割时逐页处理，并保留页码元数据
+        page_docs = [
+            Document(page_content=page_text, metadata={"page": page_num})
+            for page_num, page_text in enumerate(pages, 1)
+            if page_text.strip()
+        ]
+        logger.info(f"PDF文本提取完成，总字符数: {sum(len(page_text) for page_text in pages)}")
         
-        if not raw_text.strip():
+        if not page_docs:
             logger.error("无法从PDF中提取文本，请检查文件是否有效")
             return "无法从PDF中提取文本，请检查文件是否有效"
         
@@ -99,18 +232,27 @@ def upload_and_process_pdf(pdf_path: str) -> str:
             chunk_size=1000, 
             chunk_overlap=200
         )
-        text_chunks = text_splitter.split_text(raw_text)
+        text_chunks = text_splitter.split_documents(page_docs)
         logger.info(f"文本分割完成，生成 {len(text_chunks)} 个文本片段")
         
         # 步骤5: 创建向量数据库
         logger.info("步骤5: 创建向量数据库")
         logger.info("正在生成文本嵌入向量...")
-        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
+        texts = [chunk.page_content for chunk in text_chunks]
+        vectors = np.asarray(embed_texts(embeddings, texts), dtype=np.float32)
+        index = build_faiss_index(vectors)
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore({str(i): chunk for i, chunk in enumerate(text_chunks)}),
+            index_to_docstore_id={i: str(i) for i in range(len(text_chunks))},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
         logger.info("向量数据库创建完成")
         
         # 步骤6: 保存向量数据库到本地
         logger.info("步骤6: 保存向量数据库到本地")
-        vector_store.save_local(FAISS_DB_PATH)
+        save_vector_store(vector_store, FAISS_DB_PATH)
         logger.info(f"向量数据库已保存到: {FAISS_DB_PATH}")
         
         success_msg = f"PDF处理完成！已创建向量数据库，包含 {len(text_chunks)} 个文本片段"
@@ -6,38 +6,48 @@
 
 import os
 import sys
+import functools
 import logging
-import argparse
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import DashScopeEmbeddings
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv(project_root / '.env')
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+# 日志在 main() 中按需配置，--status 等轻量命令无需初始化
 logger = logging.getLogger(__name__)
 
 # 全局变量
 embeddings = None
 FAISS_DB_PATH = "faiss_db"
 
+# IVF 索引每次查询扫描的倒排列表数量
+IVF_NPROBE = 8
+
+# 设置 AGENTMCP_USE_GPU_FAISS=1 且存在 GPU 时，将索引迁移到 GPU 上检索；
+# GPU 资源在进程内复用
+USE_GPU_FAISS = os.getenv("AGENTMCP_USE_GPU_FAISS") == "1"
+_GPU_RES = None
+
+# 问题嵌入向量的 LRU 缓存容量，键为去除首尾空白后的问题
+QUESTION_CACHE_SIZE = 256
+
+# 已加载的向量库及其索引文件的修改时间，索引文件变化时才重新加载
+_VSTORE = None
+_VSTORE_MTIME = None
+
 
 def initialize_embeddings():
     """初始化嵌入模型"""
     global embeddings
     if embeddings is None:
+        from langchain_community.embeddings import DashScopeEmbeddings
+
         logger.info("正在初始化嵌入模型...")
         dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
         if not dashscope_api_key:
@@ -57,6 +67,112 @@ def check_database_exists() -> bool:
     return os.path.exists(FAISS_DB_PATH) and os.path.exists(os.path.join(FAISS_DB_PATH, "index.faiss"))
 
 
+def _check_faiss_simd() -> None:
+    """检查 x86_64 上的 FAISS 是否以 AVX2 编译，未启用时相似性搜索无法使用 SIMD 距离计算"""
+    import platform
+
+    # AVX2 仅存在于 x86_64，ARM 等平台的构建使用各自的 SIMD 指令集（如 NEON）
+    if platform.machine().lower() not in ("x86_64", "amd64"):
+        return
+
+    import faiss
+
+    # 动态分派构建的编译选项会列出全部已编译的 SIMD 级别，需以 SIMDConfig 报告的实际运行级别为准；
+    # 旧版本没有 SIMDConfig，退回检查编译选项
+    if hasattr(faiss, "SIMDConfig"):
+        options = faiss.SIMDConfig.get_level_name()
+    else:
+        options = faiss.get_compile_options()
+    if "AVX2" not in options and "AVX512" not in options:
+        logger.warning("当前 FAISS 未启用 AVX2，建议安装 AVX2 版本以加速相似性搜索")
+
+
+def _to_gpu(index):
+    """在启用且有可用 GPU 时将索引复制到 GPU，否则原样返回"""
+    global _GPU_RES
+    import faiss
+
+    if not USE_GPU_FAISS or faiss.get_num_gpus() == 0:
+        return index
+    try:
+        if _GPU_RES is None:
+            _GPU_RES = faiss.StandardGpuResources()
+        gpu_index = faiss.index_cpu_to_gpu(_GPU_RES, 0, index)
+        logger.info("FAISS索引已迁移到GPU")
+        return gpu_index
+    except Exception as e:
+        logger.warning(f"FAISS索引迁移到GPU失败，继续使用CPU检索: {str(e)}")
+        return index
+
+
+def _get_vector_store():
+    """获取FAISS向量库，仅在首次调用或索引文件更新后从磁盘加载"""
+    global _VSTORE, _VSTORE_MTIME
+    # 仅在真正查询时才导入 FAISS，使 --status 等命令快速启动
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    index_path = os.path.join(FAISS_DB_PATH, "index.faiss")
+    mtime = os.stat(index_path).st_mtime
+    if _VSTORE is None or _VSTORE_MTIME != mtime:
+        if _VSTORE is None:
+            _check_faiss_simd()
+        logger.info("开始加载FAISS数据库")
+        _VSTORE = FAISS.load_local(
+            FAISS_DB_PATH,
+            initialize_embeddings(),
+            allow_dangerous_deserialization=True
+        )
+        # save_local 不保存距离策略，按加载后索引的度量类型恢复内积策略
+        if _VSTORE.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            _VSTORE.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+        ivf = faiss.try_extract_index_ivf(_VSTORE.index)
+        if ivf is not None:
+            # IVF 索引改用 mmap 只读方式打开，由操作系统按需分页加载倒排列表；
+            # 部分平台（如 Windows 版 faiss-cpu）不支持 OnDiskInvertedLists，
+            # 打开失败时继续使用内存中的索引
+            try:
+                mmap_index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                ivf = faiss.try_extract_index_ivf(mmap_index)
+                _VSTORE.index = mmap_index
+            except Exception as e:
+                logger.warning(f"以mmap方式打开IVF索引失败，使用内存索引: {str(e)}")
+            ivf.nprobe = IVF_NPROBE
+        _VSTORE.index = _to_gpu(_VSTORE.index)
+        _VSTORE_MTIME = mtime
+        logger.info("FAISS数据库加载成功")
+    return _VSTORE
+
+
+@functools.lru_cache(maxsize=QUESTION_CACHE_SIZE)
+def _embed_question(question: str) -> tuple:
+    """生成问题的嵌入向量，相同问题在进程内只请求一次嵌入接口；保留大小写，缩写与专有名词不受影响"""
+    return tuple(initialize_embeddings().embed_query(question))
+
+
+def _query_vector(vector_store, question: str) -> list:
+    """生成检索用的问题向量，内积索引的文档向量已归一化，问题向量同样归一化"""
+    import faiss
+    import numpy as np
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    vector = np.asarray([_embed_question(question.strip())], dtype=np.float32)
+    if vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        faiss.normalize_L2(vector)
+    return vector[0].tolist()
+
+
+def warmup() -> None:
+    """预先初始化嵌入模型并加载向量库，使首个问题无需承担初始化开销"""
+    try:
+        initialize_embeddings()
+        if check_database_exists():
+            _get_vector_store()
+    except Exception as e:
+        logger.warning(f"预热失败，将在首次查询时重试: {str(e)}")
+
+
 def query_documents(question: str, top_k: int = 5) -> str:
     """
     基于已处理的文档回答问题
@@ -79,22 +195,13 @@ def query_documents(question: str, top_k: int = 5) -> str:
         
         logger.info("FAISS数据库存在，继续查询")
         
-        # 初始化嵌入模型
-        logger.debug("初始化嵌入模型")
-        embeddings = initialize_embeddings()
-        
-        # 加载FAISS数据库
-        logger.info("开始加载FAISS数据库")
-        vector_store = FAISS.load_local(
-            FAISS_DB_PATH, 
-            embeddings, 
-            allow_dangerous_deserialization=True
-        )
-        logger.info("FAISS数据库加载成功")
+        # 加载FAISS数据库（已缓存时直接复用）
+        vector_store = _get_vector_store()
         
         # 执行相似性搜索
         logger.info(f"执行相似性搜索，查询: '{question}', 返回数量: {top_k}")
-        docs = vector_store.similarity_search(question, k=top_k)
+        query_vector = _query_vector(vector_store, question)
+        docs = vector_store.similarity_search_by_vector(query_vector, k=top_k)
         logger.info(f"搜索完成，找到 {len(docs)} 个相关文档")
         
         if not docs:
@@ -145,8 +252,24 @@ def get_database_status() -> str:
         return f"获取数据库状态时出错: {str(e)}"
 
 
+def _configure_logging() -> None:
+    """配置日志，仅查询与交互模式需要"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
+
+
 def main():
     """主函数 - 命令行接口"""
+    # 查看状态只需检查文件，常见写法跳过参数解析与日志配置直接返回
+    if "--status" in sys.argv[1:] or "-s" in sys.argv[1:]:
+        print(get_database_status())
+        return
+    
+    import argparse
+    
     parser = argparse.ArgumentParser(description="基于FAISS向量数据库的文档查询工具")
     parser.add_argument("question", nargs="?", help="要查询的问题")
     parser.add_argument("-k", "--top-k", type=int, default=5, help="返回最相关的文档片段数量 (默认: 5)")
@@ -155,11 +278,13 @@ def main():
     
     args = parser.parse_args()
     
-    # 显示数据库状态
+    # 缩写（如 --stat）或组合短选项（如 -si）无法被上方快速路径识别，由 argparse 解析
     if args.status:
         print(get_database_status())
         return
     
+    _configure_logging()
+    
     # 交互模式
     if args.interactive:
         print("文档查询工具 - 交互模式")
@@ -167,6 +292,8 @@ def main():
         print("输入 'status' 查看数据库状态")
         print("-" * 50)
         
+        warmup()
+        
         while True:
             try:
                 question = input("\n请输入您的问题: ").strip()
@@ -1,16 +1,27 @@
 import asyncio
+import functools
 import json
 import logging
 import os
+import threading
 from typing import Any, Dict
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.chat_models import init_chat_model
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
+# 系统提示词与 Prompt 模板只依赖源码，进程内构造一次即可
+_SYSTEM_PROMPT = Path(__file__).with_name("promptTemplate.md").read_text(encoding="utf-8").strip()
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _SYSTEM_PROMPT),
+    ("user", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
+
 
 class Configuration:
     """读取 .env 与 servers_config.json"""
@@ -24,17 +35,84 @@ class Configuration:
             raise ValueError("未找到 LLM_API_KEY，请在 .env 中配置")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def load_servers(file_path: str = None) -> Dict[str, Any]:
         if file_path is None:
             file_path = Path(__file__).parent / "servers_config.json"
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f).get("mcpServers", {})
+        return orjson.loads(Path(file_path).read_bytes()).get("mcpServers", {})
 
 
-async def run_chat_loop() -> None:
-    """启动 MCP-Agent 聊天循环"""
-    cfg = Configuration()
+# 按服务器配置缓存已加载的 MCP 工具，避免每次会话都重新连接所有服务器
+_TOOLS_CACHE: Dict[str, list] = {}
+
+
+async def load_mcp_tools(servers_cfg: Dict[str, Any]) -> list:
+    """加载 MCP 工具，同一份服务器配置在进程内只加载一次"""
+    key = json.dumps(servers_cfg, sort_keys=True)
+    if key not in _TOOLS_CACHE:
+        mcp_client = MultiServerMCPClient(servers_cfg)
+        _TOOLS_CACHE[key] = await mcp_client.get_tools()
+    return _TOOLS_CACHE[key]
+
+
+def clear_mcp_cache() -> None:
+    """清除服务器配置与 MCP 工具缓存，下次加载时重新读取"""
+    Configuration.load_servers.cache_clear()
+    _TOOLS_CACHE.clear()
+
+
+async def _load_tools() -> list:
+    """读取服务器配置并加载 MCP 工具，失败时返回空列表"""
+    try:
+        tools = await load_mcp_tools(Configuration.load_servers())
+        logging.info(f"已加载 {len(tools)} 个 MCP 工具： {[t.name for t in tools]}")
+        return tools
+    except Exception as e:
+        logging.error(f"加载 MCP 工具失败: {e}")
+        print(f"警告: 无法连接到 MCP 服务器，将使用基础功能。错误: {e}")
+        # 继续运行，但不使用 MCP 工具
+        return []
+
+
+def _build_agent_executor(llm, tools: list) -> AgentExecutor:
+    """基于给定工具构造 LangChain Agent"""
+    agent = create_openai_tools_agent(llm, tools, _PROMPT)
+    return AgentExecutor(agent=agent, tools=tools, verbose=True)
+
+
+async def _ainput(prompt: str) -> str:
+    """在守护线程中读取一行输入，不阻塞事件循环，Ctrl-C 时进程可立即退出"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _resolve(setter, value) -> None:
+        if not future.done():
+            setter(value)
+
+    def _read() -> None:
+        try:
+            line = input(prompt)
+        except BaseException as exc:
+            result = (future.set_exception, exc)
+        else:
+            result = (future.set_result, line)
+        try:
+            loop.call_soon_threadsafe(_resolve, *result)
+        except RuntimeError:
+            # 事件循环已关闭（例如 Ctrl-C 退出），丢弃本次输入
+            pass
+
+    # 守护线程不属于默认线程池，asyncio.run 退出时无需等待其结束
+    threading.Thread(target=_read, daemon=True).start()
+    return await future
+
+
+# 模型 SDK 所需的环境变量只需在进程内设置一次
+_CONFIGURED = False
+
 
+def _configure_env(cfg: Configuration) -> None:
+    """设置 DeepSeek / OpenAI SDK 兼容的环境变量"""
     # 兼容 DeepSeek SDK 环境变量
     os.environ["DEEPSEEK_API_KEY"] = os.getenv("LLM_API_KEY", "")
     if cfg.base_url:
@@ -45,21 +123,17 @@ async def run_chat_loop() -> None:
     if cfg.base_url:
         os.environ["OPENAI_BASE_URL"] = cfg.base_url
 
+
+async def run_chat_loop() -> None:
+    """启动 MCP-Agent 聊天循环"""
+    global _CONFIGURED
+    cfg = Configuration()
+    if not _CONFIGURED:
+        _configure_env(cfg)
+        _CONFIGURED = True
+
     # 1️. 连接多台 MCP 服务器
-    servers_cfg = Configuration.load_servers()
-    mcp_client = MultiServerMCPClient(servers_cfg)
-    
-    # 初始化工具列表
-    tools = []
-    
-    try:
-        tools = await mcp_client.get_tools()
-        logging.info(f"已加载 {len(tools)} 个 MCP 工具： {[t.name for t in tools]}")
-    except Exception as e:
-        logging.error(f"加载 MCP 工具失败: {e}")
-        print(f"警告: 无法连接到 MCP 服务器，将使用基础功能。错误: {e}")
-        # 继续运行，但不使用 MCP 工具
-        tools = []
+    tools = await _load_tools()
 
     # 2️. 初始化大模型
     llm = init_chat_model(
@@ -68,30 +142,33 @@ async def run_chat_loop() -> None:
     )
 
     # 3️. 构造 LangChain Agent
-    prompt_md_path = Path(__file__).with_name("promptTemplate.md")
-    system_prompt = prompt_md_path.read_text(encoding="utf-8").strip()
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", "{input}"),
-        MessagesPlaceholder("agent_scratchpad"),
-    ])
-    agent = create_openai_tools_agent(llm, tools, prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = _build_agent_executor(llm, tools)
 
     # 4️. CLI 聊天
-    print("\n MCP Agent 已启动，输入 'quit' 退出")
+    print("\n MCP Agent 已启动，输入 'quit' 退出，输入 'reload' 重新加载 MCP 工具")
     print(" 可用工具:")
     for tool in tools:
         print(f"   - {tool.name}: {tool.description}")
     print()
     
     while True:
-        user_input = input("\n你: ").strip()
+        try:
+            user_input = (await _ainput("\n你: ")).strip()
+        except (EOFError, KeyboardInterrupt):
+            break
         if user_input.lower() == "quit":
             break
+        if user_input.lower() == "reload":
+            clear_mcp_cache()
+            tools = await _load_tools()
+            agent_executor = _build_agent_executor(llm, tools)
+            print(f"\n 已重新加载 {len(tools)} 个 MCP 工具")
+            continue
         try:
-            result = await agent_executor.ainvoke({"input": user_input})
-            print(f"\n AI: {result['output']}")
+            # 逐步输出 Agent 的执行结果，无需等待整条轨迹结束
+            async for chunk in agent_executor.astream({"input": user_input}):
+                if "output" in chunk:
+                    print(f"\n AI: {chunk['output']}", flush=True)
         except Exception as exc:
             print(f"\n 出错: {exc}")
 
@@ -101,4 +178,11 @@ async def run_chat_loop() -> None:
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-    asyncio.run(run_chat_loop())
+    try:
+        asyncio.run(run_chat_loop())
+    except KeyboardInterrupt:
+        print("\n 已退出，Bye!", flush=True)
+        logging.shutdown()
+        # 读取输入的守护线程可能仍阻塞在 input() 并持有 stdin 锁，
+        # 正常的解释器收尾会因此报错，这里直接结束进程
+        os._exit(130)
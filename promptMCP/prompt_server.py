@@ -1,20 +1,63 @@
 from fastmcp import FastMCP
 from typing import Annotated
+import functools
 import os
+import string
 
 mcp = FastMCP("PromptServer")
 
 # 定义提示词模板目录
 PROMPT_DIR = os.path.join(os.path.dirname(__file__), "prompts")
 
+# 服务启动时预加载的提示词模板
+PROMPT_TEMPLATES = (
+    "frontend_prompt.txt",
+    "system_analysis_prompt.txt",
+    "coding_requirement_prompt.txt",
+)
+
+@functools.lru_cache(maxsize=None)
 def load_prompt(template_name: str) -> str:
-    """从文件加载提示词模板"""
+    """从文件加载提示词模板，模板为静态文件，读取一次后缓存"""
     file_path = os.path.join(PROMPT_DIR, template_name)
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Prompt template not found: {file_path}")
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read().strip()
 
+# 格式转换标记 !r / !s / !a 对应的转换函数
+_CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+
+@functools.lru_cache(maxsize=None)
+def compile_prompt(template_name: str) -> tuple:
+    """将提示词模板预解析为 (字面文本, 字段名, 格式说明, 转换) 序列，避免每次调用重新解析格式串
+
+    仅支持具名字段；位置字段、属性/下标字段及嵌套格式说明在编译时报错。
+    """
+    compiled = []
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(load_prompt(template_name)):
+        if field_name is not None:
+            if not field_name.isidentifier():
+                raise ValueError(f"Unsupported field {{{field_name}}} in prompt template: {template_name}")
+            if format_spec and "{" in format_spec:
+                raise ValueError(f"Nested format spec in field {{{field_name}}} of prompt template: {template_name}")
+            if conversion is not None and conversion not in _CONVERSIONS:
+                raise ValueError(f"Unknown conversion !{conversion} in prompt template: {template_name}")
+        compiled.append((literal, field_name, format_spec, conversion))
+    return tuple(compiled)
+
+def render_prompt(template_name: str, **fields: str) -> str:
+    """用预解析的模板拼接提示词，结果与 template.format(**fields) 一致"""
+    parts = []
+    for literal, field_name, format_spec, conversion in compile_prompt(template_name):
+        parts.append(literal)
+        if field_name is not None:
+            value = fields[field_name]
+            if conversion is not None:
+                value = _CONVERSIONS[conversion](value)
+            parts.append(format(value, format_spec))
+    return "".join(parts)
+
 # 用于生成前端开发提示词的工具
 @mcp.tool()
 def generate_frontend_prompt(
@@ -24,8 +67,8 @@ def generate_frontend_prompt(
     special_rules: Annotated[str, "特殊规则"],
 ) -> str:
     """基于结构化输入生成详细的前端开发提示词。"""
-    template = load_prompt("frontend_prompt.txt")
-    return template.format(
+    return render_prompt(
+        "frontend_prompt.txt",
         files_to_modify=files_to_modify,
         requirements=requirements,
         references=references,
@@ -38,8 +81,7 @@ def generate_system_analysis_prompt(
     vue_file_path: Annotated[str, "Vue文件路径"]
 ) -> str:
     """基于Vue文件路径生成系统功能分析提示词。"""
-    template = load_prompt("system_analysis_prompt.txt")
-    return template.format(vue_file_path=vue_file_path)
+    return render_prompt("system_analysis_prompt.txt", vue_file_path=vue_file_path)
 
 # 用于生成coding需求提示词的工具
 @mcp.tool()
@@ -47,9 +89,10 @@ def generate_coding_requirement_prompt(
     feishu_doc_link: Annotated[str, "飞书需求文档链接"]
 ) -> str:
     """基于飞书需求文档链接生成coding需求提示词。"""
-    template = load_prompt("coding_requirement_prompt.txt")
-    return template.format(feishu_doc_link=feishu_doc_link)
+    return render_prompt("coding_requirement_prompt.txt", feishu_doc_link=feishu_doc_link)
 
 
 if __name__ == "__main__":
+    for name in PROMPT_TEMPLATES:
+        compile_prompt(name)
     mcp.run()
\ No newline at end of file